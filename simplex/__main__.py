@@ -2,14 +2,15 @@
 Main application to solve linear programs.
 """
 
+import fractions
 import sys
 from argparse import ArgumentParser, FileType
-from fractions import Fraction
 
 from . import revised
 from .algorithm import simplex
 from .parser import parse
 from .program import (
+    Fraction,
     IndexSet,
     Matrix,
     Vector,
@@ -20,21 +21,34 @@ from .program import (
 )
 
 
+def _to_fraction(x: Fraction) -> fractions.Fraction:
+    """
+    Convert the given number into a fraction of the standard library.
+
+    The revised algorithm works on Python fractions, which is not the type
+    used by the rest of the package if gmpy2 is available.
+    """
+    if isinstance(x, fractions.Fraction):
+        return x
+    return fractions.Fraction(int(x.numerator), int(x.denominator))
+
+
 def _revised_simplex(
     N: IndexSet, B: IndexSet, A: Matrix, b: Vector, c: Vector, v: Fraction
 ):
+    # the coefficients of the non-basic variables followed by an identity
+    # matrix for the basic (slack) variables
+    zero, one = fractions.Fraction(0), fractions.Fraction(1)
     mat = []
-    for i in B:
-        row = []
-        for j in N:
-            row.append(A[i][j])
-        for ii in B:
-            row.append(Fraction(1 if i == ii else 0))
-        mat.append(row)
+    for k, i in enumerate(B):
+        row = A[i]
+        unit = [zero] * len(B)
+        unit[k] = one
+        mat.append([_to_fraction(row[j]) if j in row else zero for j in N] + unit)
 
     a = revised.mat(mat)
-    x = revised.vec([b[i] for i in B])
-    z = revised.vec([-c[j] for j in N])
+    x = revised.vec([_to_fraction(b[i]) for i in B])
+    z = revised.vec([-_to_fraction(c[j]) for j in N])
 
     if v != 0:
         print(f"reported bounds are offset by {v}")
@@ -53,6 +67,12 @@ def main():
     parser.add_argument(
         "-r", "--revised", action="store_true", help="Use revised simplex algorithm."
     )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Print the intermediate steps of the simplex algorithm.",
+    )
     args = parser.parse_args()
     prg = args.file.read()
 
@@ -68,7 +88,7 @@ def main():
     if args.revised:
         _revised_simplex(*sf[1:])
     else:
-        sol = simplex(*sf)
+        sol = simplex(*sf, verbose=args.verbose)
 
         print("solution:")
         print(solution_to_str(*sf[:2], *sol))
@@ -2,10 +2,11 @@
 The main simplex algorithm.
 """
 
-from fractions import Fraction
-from typing import Callable, Tuple, cast
+from typing import Callable, Set, Tuple, cast
 
 from .program import (
+    HAS_GMPY2,
+    Fraction,
     Index,
     IndexSet,
     Matrix,
@@ -16,69 +17,145 @@ from .program import (
     vector,
 )
 
+_ZERO = Fraction(0)
+_ONE = Fraction(1)
+_MINUS_ONE = Fraction(-1)
+
+if HAS_GMPY2:
+
+    def _sub_mul(x: Fraction, a: Fraction, b: Fraction) -> Fraction:
+        """
+        Compute x - a * b.
+        """
+        return x - a * b
+
+    def _sub_row(row: Vector, a: Fraction, row_e: Vector):
+        """
+        Subtract a times row e from the given sparse row in place.
+
+        Only the non-zero entries of row e are visited and entries cancelling
+        out are removed to keep the row sparse.
+        """
+        for j, a_ej in row_e.items():
+            a_j = row[j] - a * a_ej
+            if a_j != 0:
+                row[j] = a_j
+            else:
+                del row[j]
+
+    def _div_row(row: Vector, a: Fraction):
+        """
+        Divide the given sparse row by a in place.
+        """
+        inv = 1 / a
+        for j, a_j in row.items():
+            row[j] = a_j * inv
+
+else:
+
+    def _sub_mul(x: Fraction, a: Fraction, b: Fraction) -> Fraction:
+        """
+        Same as the gmpy2 variant but normalizes the result only once.
+
+        Chaining the operators on Fraction computes a GCD for each intermediate
+        result, which dominates the cost of pivoting.
+        """
+        x_d, a_d, b_d = x.denominator, a.denominator, b.denominator
+        return Fraction(
+            x.numerator * a_d * b_d - a.numerator * b.numerator * x_d, x_d * a_d * b_d
+        )
+
+    def _sub_row(row: Vector, a: Fraction, row_e: Vector):
+        """
+        Same as the gmpy2 variant but normalizes each updated entry only once.
+        """
+        # this is _sub_mul with the multiplier hoisted out of the loop
+        a_n, a_d = a.numerator, a.denominator
+        for j, a_ej in row_e.items():
+            x = row[j]
+            x_d, e_d = x.denominator, a_ej.denominator
+            a_j = Fraction(
+                x.numerator * a_d * e_d - a_n * a_ej.numerator * x_d, x_d * a_d * e_d
+            )
+            if a_j != 0:
+                row[j] = a_j
+            else:
+                del row[j]
+
+    def _div_row(row: Vector, a: Fraction):
+        """
+        Same as the gmpy2 variant but normalizes each entry only once.
+        """
+        inv_n, inv_d = a.denominator, a.numerator
+        for j, a_j in row.items():
+            row[j] = Fraction(a_j.numerator * inv_n, a_j.denominator * inv_d)
+
+
+def _eliminate(row: Vector, e: Index, row_e: Vector) -> Fraction:
+    """
+    Eliminate variable x_e from the given sparse row in place using row e.
+
+    The previous coefficient of x_e is returned.
+    """
+    a_e = row.pop(e, _ZERO)
+    if a_e != 0:
+        _sub_row(row, a_e, row_e)
+    return a_e
+
 
 def pivot(
-    N: IndexSet,
-    B: IndexSet,
+    N: Set[Index],
+    B: Set[Index],
     A: Matrix,
     b: Vector,
     c: Vector,
     v: Fraction,
     l: Index,
     e: Index,
-) -> Tuple[IndexSet, IndexSet, Matrix, Vector, Vector, Fraction]:
+) -> Fraction:
     """
     Pivot around the given leaving and entering variables.
+
+    The tableau given by N, B, A, b, and c is updated in place. Rows not
+    mentioning the entering variable are not touched at all. The new value of
+    the objective function is returned.
     """
-    An = matrix()
-    bn = vector()
-    cn = vector()
-
-    # take care of row e
-    bn[e] = b[l] / A[l][e]
-    for j in N:
-        if j == e:
-            continue
-        An[e][j] = A[l][j] / A[l][e]
-    An[e][l] = 1 / A[l][e]
+    # turn row l into row e (only the non-zero entries of row l are visited)
+    row_e = A.pop(l)
+    a_le = row_e.pop(e)
+    row_e[l] = _ONE
+    _div_row(row_e, a_le)
+    A[e] = row_e
+    b[e] = b_e = b.pop(l) / a_le
 
     # take care of the remaining rows
     for i in B:
         if i == l:
             continue
-        bn[i] = b[i] - A[i][e] * bn[e]
-        for j in N:
-            if j == e:
-                continue
-            An[i][j] = A[i][j] - A[i][e] * An[e][j]
-        An[i][l] = -A[i][e] * An[e][l]
+        b[i] = _sub_mul(b[i], _eliminate(A[i], e, row_e), b_e)
 
     # compute objective function
-    vn = v + c[e] * bn[e]
-    for j in N:
-        if j == e:
-            continue
-        cn[j] = c[j] - c[e] * An[e][j]
-    cn[l] = -c[e] * An[e][l]
+    v += _eliminate(c, e, row_e) * b_e
 
     # swap x_e and x_l
-    Nn = N[:]
-    Nn[N.index(e)] = l
-    Bn = B[:]
-    Bn[B.index(l)] = e
+    N.remove(e)
+    N.add(l)
+    B.remove(l)
+    B.add(e)
 
-    return Nn, Bn, An, bn, cn, vn
+    return v
 
 
 def solve(
     M: VariableMap,
-    N: IndexSet,
-    B: IndexSet,
+    N: Set[Index],
+    B: Set[Index],
     A: Matrix,
     b: Vector,
     c: Vector,
     v: Fraction,
-) -> Tuple[IndexSet, IndexSet, Matrix, Vector, Vector, Fraction]:
+    verbose: bool = False,
+) -> Tuple[Set[Index], Set[Index], Matrix, Vector, Vector, Fraction]:
     """
     Solve a linear program in canonical form.
 
@@ -95,79 +172,94 @@ def solve(
 
     We can then flip the roles of leaving and entering variables.
 
+    Both variables are selected according to Bland's rule: the entering
+    variable is the one with the smallest index among the candidates and ties
+    in the choice of the leaving variable are broken by picking the one with
+    the smallest index. This guarantees that the algorithm does not cycle on
+    degenerate problems.
+
     This function just selects two suitable variables and then calls the pivot
     function to take care of rewriting the tableau. The actual assignemnt to
     variables is implicitely encoded in the tableau.
+
+    The given index sets and tableau are updated in place. If verbose is set,
+    the tableau is printed after each pivot.
     """
     while True:
-        # pylint: disable=undefined-loop-variable
-        # select an entering variable
-        for e in sorted(N):
-            if c[e] > 0:
-                break
-        else:
+        # select the entering variable with the smallest index (the objective
+        # only mentions non-basic variables, so its entries can be scanned)
+        e = min((j for j, c_j in c.items() if c_j > 0), default=None)
+        if e is None:
             break
 
-        # select a leaving variable
-        l = None
-        mm = None
-        for i in B:
-            if A[i][e] > 0:
-                m = b[i] / A[i][e]
-                if l is None or m < mm or (m == mm and i < l):
-                    l = i
-                    mm = m
+        # select the leaving variable with the smallest ratio (and index)
+        col = ((i, A[i].get(e, 0)) for i in B)
+        ratio = min(((b[i] / a_ie, i) for i, a_ie in col if a_ie > 0), default=None)
 
         # do the pivot if the problem is bounded
-        if l is None:
+        if ratio is None:
             raise RuntimeError("problem is unbounded")
-        print(f"after pivoting around {M[l]} and {M[e]}")
-        N, B, A, b, c, v = pivot(N, B, A, b, c, v, l, e)
-        print(slack_form_to_str(M, N, B, A, b, c, v))
+        l = ratio[1]
+        v = pivot(N, B, A, b, c, v, l, e)
+        if verbose:
+            print(f"after pivoting around {M[l]} and {M[e]}")
+            print(slack_form_to_str(M, N, B, A, b, c, v))
     return N, B, A, b, c, v
 
 
 def initialize(
     M: VariableMap,
-    N: IndexSet,
-    B: IndexSet,
+    N: Set[Index],
+    B: Set[Index],
     A: Matrix,
     b: Vector,
     c: Vector,
     v: Fraction,
+    verbose: bool = False,
 ):
     """
     Bring a linear program in slack form into canonical form.
-    """
-    l = min(b, key=cast(Callable[[int], Fraction], b.get))
 
+    The given index sets and tableau are updated in place. If verbose is set,
+    the intermediate problems are printed.
+    """
     # check if the basic solution is already feasible
-    if b[l] >= 0:
+    if min(b.values()) >= 0:
         return N, B, A, b, c, v
 
-    # construct artificial problem
-    N = N + [0]
-    for i in B:
-        A[i][0] = Fraction(-1)
-    c_orig, v_orig, c = c, v, vector([(0, Fraction(-1))])
-    N, B, A, b, c, v = pivot(N, B, A, b, c, v, l, 0)
+    l = min(b, key=cast(Callable[[int], Fraction], b.get))
 
-    print("artificial problem:")
-    print(slack_form_to_str(M, N, B, A, b, c, v))
+    # construct the artificial problem with objective -x_0 where x_0 appears
+    # with coefficient -1 in all rows and immediately pivot around x_l and x_0
+    # (row l, negated, becomes row 0, which is then added to all other rows)
+    row_0 = vector((j, -a_lj) for j, a_lj in A.pop(l).items())
+    row_0[l] = _MINUS_ONE
+    b_0 = -b.pop(l)
+    for i in B:
+        if i == l:
+            continue
+        _sub_row(A[i], _MINUS_ONE, row_0)
+        b[i] += b_0
+    A[0], b[0] = row_0, b_0
+    c_orig, v_orig, c, v = c, v, vector(row_0.items()), v - b_0
+    N.add(l)
+    B.remove(l)
+    B.add(0)
+
+    if verbose:
+        print("artificial problem:")
+        print(slack_form_to_str(M, N, B, A, b, c, v))
 
     # solve artificial problem
-    N, B, A, b, c, v = solve(M, N, B, A, b, c, v)
+    N, B, A, b, c, v = solve(M, N, B, A, b, c, v, verbose)
 
     if b[0] > 0:
         raise RuntimeError("problem is infeasible")
 
     if 0 in B:
         # move variable x_0 out of the basis by an arbitrary degenerate pivot
-        for e in N:
-            if A[0][e] == 0:
-                continue
-            N, B, A, b, c, v = pivot(N, B, A, b, c, v, 0, e)
-            break
+        e = min(j for j, a_0j in A[0].items() if a_0j != 0)
+        v = pivot(N, B, A, b, c, v, 0, e)
 
     # remove the artificial variable
     N.remove(0)
@@ -180,12 +272,12 @@ def initialize(
         if i in N:
             c[i] += val
         elif i in B:
-            v += c_orig[i] * b[i]
-            for j in A[i]:
-                c[j] -= c_orig[i] * A[i][j]
+            v += val * b[i]
+            _sub_row(c, val, A[i])
 
-    print("initialized problem:")
-    print(slack_form_to_str(M, N, B, A, b, c, v))
+    if verbose:
+        print("initialized problem:")
+        print(slack_form_to_str(M, N, B, A, b, c, v))
     return N, B, A, b, c, v
 
 
@@ -197,15 +289,25 @@ def simplex(
     b: Vector,
     c: Vector,
     v: Fraction,
+    verbose: bool = False,
 ) -> Tuple[Vector, Fraction]:
     """
     Solve a linear program in slack form.
+
+    The given slack form is not modified. If verbose is set, the intermediate
+    steps of the algorithm are printed.
     """
+    # the functions below update the index sets and the tableau in place, so
+    # they work on copies
+    non_basic, basic = set(N), set(B)
+    A = matrix((i, vector(row.items())) for i, row in A.items())
+    b, c = vector(b.items()), vector(c.items())
+
     # initialize problem
-    N, B, A, b, c, v = initialize(M, N, B, A, b, c, v)
+    non_basic, basic, A, b, c, v = initialize(M, non_basic, basic, A, b, c, v, verbose)
 
     # solve problem
-    N, B, A, b, c, v = solve(M, N, B, A, b, c, v)
+    _, _, _, b, _, v = solve(M, non_basic, basic, A, b, c, v, verbose)
 
     # return solution
     return b.copy(), v
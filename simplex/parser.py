@@ -4,13 +4,26 @@ A parser to read the string representation of a linear program.
 
 import re
 from collections import defaultdict
-from fractions import Fraction
 from typing import DefaultDict, Generator, Iterator, List, Optional, Tuple, Union, cast
 
-from .program import Constraint, Objective, Program, Term
+from .program import Constraint, Fraction, Objective, Program, Term
 
 RawTerm = List[Tuple[Fraction, Optional[str]]]
 
+_ZERO = Fraction(0)
+_ONE = Fraction(1)
+
+_TOKEN_RE = re.compile(
+    r"(?P<number>[0-9]+)|"
+    r"(?P<identifier>[a-zA-Z][a-zA-Z_0-9]*)|"
+    r"(?P<operator>[-+*/])|"
+    r"(?P<relation>>=|<=|=)|"
+    r"(?P<whitespace>[ \t\r]+)|"
+    r"(?P<newline>\n)|"
+    r"(?P<objective>#minimize|#maximize)|"
+    r"(?P<parenthesis>[()])"
+)
+
 
 def _negate(term: RawTerm) -> RawTerm:
     """
@@ -25,7 +38,7 @@ def _to_number(term: RawTerm) -> Fraction:
     """
     Convert the given term to a number or raise an error.
     """
-    ret = Fraction(0)
+    ret = _ZERO
     for n, v in term:
         if v is not None:
             raise RuntimeError("number expected")
@@ -119,21 +132,11 @@ class Parser:
         The tokenizer for the parser.
         """
         n = 0
-        regexp = re.compile(
-            r"(?P<number>[0-9]+)|"
-            r"(?P<identifier>[a-zA-Z][a-zA-Z_0-9]*)|"
-            r"(?P<operator>[-+*/])|"
-            r"(?P<relation>>=|<=|=)|"
-            r"(?P<whitespace>[ \t\r]+)|"
-            r"(?P<newline>\n)|"
-            r"(?P<objective>#minimize|#maximize)|"
-            r"(?P<parenthesis>[()])"
-        )
         while n < len(line):
-            match = regexp.match(line[n:])
+            match = _TOKEN_RE.match(line, n)
             if match is None:
                 raise RuntimeError("failed to match")
-            n += match.span(0)[1]
+            n = match.end()
             assert match.lastgroup is not None
             if match.lastgroup != "whitespace":
                 yield match.lastgroup, match.group(0)
@@ -196,13 +199,16 @@ class Parser:
     def _constraints(self) -> List[Constraint]:
         """
         See the matching production in the class docstring.
+
+        The right recursion of the production is implemented as a loop.
         """
-        c = self._constraint()
-        while self._accept("newline"):
-            pass
-        if self._peek("objective"):
-            return [c]
-        return [c] + self._constraints()
+        cs = []
+        while True:
+            cs.append(self._constraint())
+            while self._accept("newline"):
+                pass
+            if self._peek("objective"):
+                return cs
 
     def _constraint(self) -> Constraint:
         """
@@ -217,17 +223,24 @@ class Parser:
         """
         See the matching production in the class docstring.
         """
-        return self._mul_term() + self._sum_cont()
+        term = self._mul_term()
+        term.extend(self._sum_cont())
+        return term
 
     def _sum_cont(self) -> RawTerm:
         """
         See the matching production in the class docstring.
+
+        The right recursion of the production is implemented as a loop.
         """
-        if self._accept("operator", "+"):
-            return self._mul_term() + self._sum_cont()
-        if self._accept("operator", "-"):
-            return _negate(self._mul_term()) + self._sum_cont()
-        return []
+        term: RawTerm = []
+        while True:
+            if self._accept("operator", "+"):
+                term.extend(self._mul_term())
+            elif self._accept("operator", "-"):
+                term.extend(_negate(self._mul_term()))
+            else:
+                return term
 
     def _mul_term(self) -> RawTerm:
         """
@@ -239,12 +252,16 @@ class Parser:
     def _mul_cont(self, lhs) -> RawTerm:
         """
         See the matching production in the class docstring.
+
+        The right recursion of the production is implemented as a loop.
         """
-        if self._accept("operator", "/"):
-            return self._mul_cont(_divide(lhs, self._neg_term()))
-        if self._accept("operator", "*"):
-            return self._mul_cont(_multiply(lhs, self._neg_term()))
-        return lhs
+        while True:
+            if self._accept("operator", "/"):
+                lhs = _divide(lhs, self._neg_term())
+            elif self._accept("operator", "*"):
+                lhs = _multiply(lhs, self._neg_term())
+            else:
+                return lhs
 
     def _neg_term(self) -> RawTerm:
         """
@@ -264,9 +281,9 @@ class Parser:
             return term
         kind, val = self._consume()
         if kind == "number":
-            return [(Fraction(val), None)]
+            return [(Fraction(int(val)), None)]
         if kind == "identifier":
-            return [(Fraction(1), val)]
+            return [(_ONE, val)]
         raise RuntimeError("number or variable expected")
 
 
@@ -3,8 +3,24 @@ Basic definitions and functions for linear programs.
 """
 
 from collections import defaultdict
-from fractions import Fraction
-from typing import DefaultDict, Dict, List, Sequence, Tuple
+from itertools import chain
+from typing import TYPE_CHECKING, DefaultDict, Dict, Iterable, List, Tuple
+
+# GMP's rationals are used if gmpy2 is installed; they provide the same
+# interface as Python's fractions but are implemented in C
+if TYPE_CHECKING:
+    from fractions import Fraction
+
+    HAS_GMPY2 = False
+else:
+    try:
+        from gmpy2 import mpq as Fraction
+
+        HAS_GMPY2 = True
+    except ImportError:
+        from fractions import Fraction
+
+        HAS_GMPY2 = False
 
 Term = Tuple[Fraction, str]
 Constraint = Tuple[List[Term], str, Fraction]
@@ -17,18 +33,20 @@ IndexSet = List[int]
 Vector = DefaultDict[int, Fraction]
 Matrix = DefaultDict[int, Vector]
 
+_ZERO = Fraction(0)
+
 
-def vector(elems: Sequence[Tuple[int, Fraction]] = ()) -> Vector:
+def vector(elems: Iterable[Tuple[int, Fraction]] = ()) -> Vector:
     """
     Construct a sparse vector.
     """
-    vec = defaultdict(lambda: Fraction(0))
+    vec = defaultdict(lambda: _ZERO)
     for idx, val in elems:
         vec[idx] = val
     return vec
 
 
-def matrix(elems: Sequence[Tuple[int, Vector]] = ()) -> Matrix:
+def matrix(elems: Iterable[Tuple[int, Vector]] = ()) -> Matrix:
     """
     Construct a sparse matrix.
     """
@@ -40,8 +58,8 @@ def matrix(elems: Sequence[Tuple[int, Vector]] = ()) -> Matrix:
 
 def slack_form_to_str(
     M: VariableMap,
-    N: IndexSet,
-    B: IndexSet,
+    N: Iterable[Index],
+    B: Iterable[Index],
     A: Matrix,
     b: Vector,
     c: Vector,
@@ -50,16 +68,19 @@ def slack_form_to_str(
     """
     Convert the given linear program in slack form into a readable string.
     """
-    ret = f"{M[-1]:<3} = {float(v):7.2f} + "
-    ret += " + ".join(f"{float(c[j]):7.2f} {M[j]:<3}" for j in sorted(N))
-    ret += "\n"
+    cols = sorted(N)
+    names = [f"{M[j]:<3}" for j in cols]
+
+    lines = []
+    terms = (f"{float(c.get(j, 0)):7.2f} {n}" for j, n in zip(cols, names))
+    lines.append(f"{M[-1]:<3} = {float(v):7.2f} + " + " + ".join(terms))
     for i in sorted(B):
-        ret += f"{M[i]:<3} = ".rjust(6)
-        ret += f"{float(b[i]):7.2f} - "
-        ret += " - ".join(f"{float(A[i][j]):7.2f} {M[j]:<3}" for j in sorted(N))
-        ret += "\n"
+        row = A.get(i, vector())
+        terms = (f"{float(row.get(j, 0)):7.2f} {n}" for j, n in zip(cols, names))
+        lhs = f"{M[i]:<3} = ".rjust(6)
+        lines.append(f"{lhs}{float(b[i]):7.2f} - " + " - ".join(terms))
 
-    return ret
+    return "".join(f"{line}\n" for line in lines)
 
 
 def program_to_str(constraints: List[Constraint], objective: Objective) -> str:
@@ -75,15 +96,13 @@ def program_to_str(constraints: List[Constraint], objective: Objective) -> str:
         return f"{co} {var}"
 
     v, c = objective
-    ret = ""
+    lines = []
     for lhs, rel, b in constraints:
-        ret += " + ".join(simp(co, var) for co, var in lhs)
-        ret += f" {rel} {b}"
-        ret += "\n"
-    ret += "#maximize "
-    ret += " + ".join(([f"{v}"] if v != 0 else []) + [simp(co, var) for co, var in c])
+        lines.append(" + ".join(simp(co, var) for co, var in lhs) + f" {rel} {b}")
+    terms = ([f"{v}"] if v != 0 else []) + [simp(co, var) for co, var in c]
+    lines.append("#maximize " + " + ".join(terms))
 
-    return ret
+    return "\n".join(lines)
 
 
 def solution_to_str(M: VariableMap, N: IndexSet, x: Vector, z: Fraction) -> str:
@@ -101,24 +120,17 @@ def slack_form(constraints: List[Constraint], objective: Objective):
     """
     M: Dict[str, int]
     M = {}
-    N: IndexSet = []
     B: IndexSet = []
     A = matrix()
     b = vector()
     c = vector()
     v = objective[0]
 
-    # extract variables
-    def add_var(lhs):
-        nonlocal M, N
-        for _, var in lhs:
-            if var not in M:
-                M[var] = len(M) + 1
-                N.append(M[var])
-
-    for lhs, rel, rhs in constraints:
-        add_var(lhs)
-    add_var(objective[1])
+    # extract variables in order of their first occurrence
+    terms = chain.from_iterable(lhs for lhs, _, _ in constraints)
+    for _, var in chain(terms, objective[1]):
+        M.setdefault(var, len(M) + 1)
+    N: IndexSet = list(M.values())
 
     # create auxiliary variables
     s = 0
@@ -141,11 +153,14 @@ def slack_form(constraints: List[Constraint], objective: Objective):
     # build coefficient matrix
     def add_row(lhs, rhs, mul):
         i = aux_var()
-        for co, var in lhs:
-            j = M[var]
-            A[i][j] = mul * co
+        A[i] = vector((M[var], mul * co) for co, var in lhs)
         b[i] = mul * rhs
 
+    # each equality is added as a <= constraint and a single >= constraint over
+    # the sums of all equalities makes sure that they are all satisfied with
+    # equality (this needs k + 1 instead of 2k rows for k equalities)
+    eq_lhs: DefaultDict[str, Fraction] = defaultdict(Fraction)
+    eq_rhs, has_eq = Fraction(0), False
     for lhs, rel, rhs in constraints:
         if rel == "<=":
             add_row(lhs, rhs, 1)
@@ -153,7 +168,12 @@ def slack_form(constraints: List[Constraint], objective: Objective):
             add_row(lhs, rhs, -1)
         if rel == "=":
             add_row(lhs, rhs, 1)
-            add_row(lhs, rhs, -1)
+            for co, var in lhs:
+                eq_lhs[var] += co
+            eq_rhs += rhs
+            has_eq = True
+    if has_eq:
+        add_row([(co, var) for var, co in eq_lhs.items() if co != 0], eq_rhs, -1)
 
     # build objective
     if "z" not in M:
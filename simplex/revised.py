@@ -7,6 +7,7 @@ problem that have no intial feasible solutions.
 
 from enum import Enum
 from fractions import Fraction
+from functools import lru_cache
 
 import pymatrix
 
@@ -21,96 +22,247 @@ class Result(Enum):
     INFEASIBLE = 3
 
 
+@lru_cache(maxsize=1024)
+def _to_fraction(v):
+    """
+    Convert the given number into a fraction.
+
+    Inputs mostly consist of a few small integers, so conversions are cached.
+    """
+    return Fraction(v)
+
+
 def mat(x):
     """
     Construct a matrix given as list of rows.
     """
-    return pymatrix.Matrix.from_list([[Fraction(v) for v in r] for r in x])
+    return pymatrix.Matrix.from_list(
+        [[v if isinstance(v, Fraction) else _to_fraction(v) for v in r] for r in x]
+    )
 
 
 def vec(x):
     """
     Construct a vector given as list.
     """
-    return mat([x]).trans()
+    return mat([[v] for v in x])
+
+
+def lu_factor(cols):
+    """
+    Compute the LU factorization of the square matrix given as list of columns.
+
+    The factorization is returned as a pair of a matrix, given as a list of
+    rows holding both triangular factors, and the row permutation.
+    """
+    m_lu = [list(r) for r in zip(*cols)]
+    perm = list(range(len(m_lu)))
+    for k, row_k in enumerate(m_lu):
+        if row_k[k] == 0:
+            # swap in the next row with a non-zero entry as pivot
+            p = next(i for i in range(k + 1, len(m_lu)) if m_lu[i][k] != 0)
+            m_lu[k], m_lu[p], perm[k], perm[p] = m_lu[p], row_k, perm[p], perm[k]
+            row_k = m_lu[k]
+        # only the non-zero entries of the pivot row have to be eliminated
+        nz_k = [j for j in range(k + 1, len(row_k)) if row_k[j] != 0]
+        for i in range(k + 1, len(m_lu)):
+            row_i = m_lu[i]
+            if row_i[k] != 0:
+                row_i[k] /= row_k[k]
+                for j in nz_k:
+                    row_i[j] -= row_i[k] * row_k[j]
+    return m_lu, perm
+
+
+def lu_solve(lu, v):
+    """
+    Solve the system B x = v given the LU factorization of B.
+    """
+    m_lu, perm = lu
+    x = [v[p] for p in perm]
+    for i, row in enumerate(m_lu):
+        x[i] -= sum(row[j] * x[j] for j in range(i) if x[j] != 0)
+    for i in reversed(range(len(x))):
+        row = m_lu[i]
+        dot = sum(row[j] * x[j] for j in range(i + 1, len(x)) if x[j] != 0)
+        x[i] = (x[i] - dot) / row[i]
+    return x
+
+
+def lu_solve_trans(lu, v):
+    """
+    Solve the system B^T y = v given the LU factorization of B.
+    """
+    m_lu, perm = lu
+    w = list(v)
+    for i, row in enumerate(m_lu):
+        dot = sum(m_lu[j][i] * w[j] for j in range(i) if w[j] != 0)
+        w[i] = (w[i] - dot) / row[i]
+    for i in reversed(range(len(w))):
+        w[i] -= sum(m_lu[j][i] * w[j] for j in range(i + 1, len(w)) if w[j] != 0)
+    y = [0] * len(w)
+    for k, p in enumerate(perm):
+        y[p] = w[k]
+    return y
+
+
+class Basis:
+    """
+    Factorization of a basis supporting the exchange of columns.
+
+    The basis is factored with lu_factor. Subsequent column exchanges are
+    recorded as eta columns (product form of the inverse) so that the basis
+    does not have to be factored again after each exchange.
+    """
 
+    def __init__(self, cols):
+        self.lu = lu_factor(cols)
+        self.etas = []
+
+    def __len__(self):
+        """
+        Return the number of rows (and columns) of the basis.
+        """
+        return len(self.lu[1])
+
+    def solve(self, v):
+        """
+        Solve the system B x = v.
+        """
+        x = lu_solve(self.lu, v)
+        for i, d in self.etas:
+            x_i = x[i] / d[i]
+            for k, d_k in enumerate(d):
+                if d_k != 0:
+                    x[k] -= d_k * x_i
+            x[i] = x_i
+        return x
+
+    def solve_trans(self, v):
+        """
+        Solve the system B^T y = v.
+        """
+        w = list(v)
+        for i, d in reversed(self.etas):
+            dot = sum(d_k * w[k] for k, d_k in enumerate(d) if k != i and d_k != 0)
+            w[i] = (w[i] - dot) / d[i]
+        return lu_solve_trans(self.lu, w)
+
+    def exchange(self, i, d):
+        """
+        Replace column i of the basis.
+
+        The direction d is the entering column multiplied with the inverse of
+        the current basis.
+        """
+        self.etas.append((i, d))
+
+
+def direction_x(cols, i_n, basis, j):
+    """
+    Compute the change of the basic variables if non-basic variable j enters.
 
-def extract(rev, idx, m):
+    This is column j of the matrix B^-1 N.
     """
-    Extract the given columns from the matrix.
+    return vec(basis.solve(cols[i_n[j]]))
+
+
+def direction_z(cols, i_n, basis, i):
+    """
+    Compute the change of the dual variables if basic variable i leaves.
+
+    This is row i of the matrix -B^-1 N, which is obtained by a single solve
+    with the transposed basis.
     """
-    res = []
-    for i in idx:
-        res.append(list(m.col(rev[i])))
-    return mat(res).trans()
+    unit = [0] * len(basis)
+    unit[i] = 1
+    y = basis.solve_trans(unit)
+    return vec([-sum(a * b for a, b in zip(cols[t], y) if a != 0) for t in i_n])
 
 
-def solve_primal(rev, m_a, i_n, i_b, v_x, v_z):
+def update_basis(cols, i_b, basis, i, d_x):
+    """
+    Update the basis after the i-th basic variable has been exchanged.
+
+    The basis is factored again once as many columns have been exchanged as
+    the basis has rows.
+    """
+    if len(basis.etas) + 1 < len(i_b):
+        basis.exchange(i, list(d_x.col(0)))
+        return basis
+    return Basis([cols[t] for t in i_b])
+
+
+def solve_primal(cols, i_n, i_b, v_x, v_z, copy=True):
     """
     Simplex implementation asssuming that the input is primal feasible.
+
+    If copy is false, the function takes ownership of the given index lists
+    and vectors and modifies them instead of working on copies.
     """
     assert all(x >= 0 for x in v_x.col(0))
 
-    i_n = i_n.copy()
-    i_b = i_b.copy()
-    v_x = v_x.copy()
-    v_z = v_z.copy()
+    if copy:
+        i_n, i_b, v_x, v_z = i_n.copy(), i_b.copy(), v_x.copy(), v_z.copy()
     res = Result.BOUNDED
+    basis = Basis([cols[t] for t in i_b])
 
     while True:
         j, z = min(enumerate(v_z.col(0)), key=lambda x: x[1])
         if z >= 0:
             break
-        m_b = extract(rev, i_b, m_a)
-        m_n = extract(rev, i_n, m_a)
-        d_x = (m_b.inv() * m_n).colvec(j)
-        if all(a <= 0 for a in d_x.col(0)):
+        d_x = direction_x(cols, i_n, basis, j)
+        iab = enumerate(zip(d_x.col(0), v_x.col(0)))
+        ratio = min(((b / a, i) for i, (a, b) in iab if a > 0), default=None)
+        if ratio is None:
             res = Result.UNBOUNDED
             break
-        iab = enumerate(zip(d_x.col(0), v_x.col(0)))
-        t, i = min((b / a, i) for i, (a, b) in iab if a > 0)
-        d_z = -(m_b.inv() * m_n).trans().colvec(i)
+        t, i = ratio
+        d_z = direction_z(cols, i_n, basis, i)
         s = v_z[j][0] / d_z[j][0]
         v_x -= t * d_x
         v_x[i][0] = t
         v_z -= s * d_z
         v_z[j][0] = s
         i_b[i], i_n[j] = i_n[j], i_b[i]
+        basis = update_basis(cols, i_b, basis, i, d_x)
 
     return res, i_n, i_b, v_x, v_z
 
 
-def solve_dual(rev, m_a, i_n, i_b, v_x, v_z):
+def solve_dual(cols, i_n, i_b, v_x, v_z, copy=True):
     """
     Simplex implementation asssuming that the input is dual feasible.
+
+    If copy is false, the function takes ownership of the given index lists
+    and vectors and modifies them instead of working on copies.
     """
     assert all(z >= 0 for z in v_z.col(0))
 
-    i_n = i_n.copy()
-    i_b = i_b.copy()
-    v_x = v_x.copy()
-    v_z = v_z.copy()
+    if copy:
+        i_n, i_b, v_x, v_z = i_n.copy(), i_b.copy(), v_x.copy(), v_z.copy()
     res = Result.BOUNDED
+    basis = Basis([cols[t] for t in i_b])
 
     while True:
         i, x = min(enumerate(v_x.col(0)), key=lambda x: x[1])
         if x >= 0:
             break
-        m_b = extract(rev, i_b, m_a)
-        m_n = extract(rev, i_n, m_a)
-        d_z = -(m_b.inv() * m_n).trans().colvec(i)
-        if all(a <= 0 for a in d_z.col(0)):
+        d_z = direction_z(cols, i_n, basis, i)
+        iab = enumerate(zip(d_z.col(0), v_z.col(0)))
+        ratio = min(((b / a, j) for j, (a, b) in iab if a > 0), default=None)
+        if ratio is None:
             res = Result.UNBOUNDED
             break
-        iab = enumerate(zip(d_z.col(0), v_z.col(0)))
-        s, j = min((b / a, j) for j, (a, b) in iab if a > 0)
-        d_x = (m_b.inv() * m_n).colvec(j)
+        s, j = ratio
+        d_x = direction_x(cols, i_n, basis, j)
         t = v_x[i][0] / d_x[i][0]
         v_x -= t * d_x
         v_x[i][0] = t
         v_z -= s * d_z
         v_z[j][0] = s
         i_b[i], i_n[j] = i_n[j], i_b[i]
+        basis = update_basis(cols, i_b, basis, i, d_x)
 
     return res, i_n, i_b, v_x, v_z
 
@@ -119,21 +271,19 @@ def solve(m_a, i_n, i_b, v_x, v_z):
     """
     A two-phase solve implementation.
     """
-    rev = {}
-    for j, t in enumerate(i_n):
-        rev[t] = j
-    for i, t in enumerate(i_b):
-        rev[t] = i + len(i_n)
+    # the columns of the matrix are stored once by variable because the
+    # algorithm only ever accesses columns
+    cols = {t: list(col) for t, col in zip(i_n + i_b, m_a.cols())}
 
     primal_feasible = all(x >= 0 for x in v_x.col(0))
     dual_feasible = all(z >= 0 for z in v_z.col(0))
     if primal_feasible and dual_feasible:
         return Result.BOUNDED, i_n.copy(), i_b.copy(), v_x.copy(), v_z.copy()
     if primal_feasible:
-        return solve_primal(rev, m_a, i_n, i_b, v_x, v_z)
+        return solve_primal(cols, i_n, i_b, v_x, v_z)
 
     s_z = v_z if dual_feasible else vec([0 for _ in v_z.col(0)])
-    res, d_n, d_b, d_x, d_z = solve_dual(rev, m_a, i_n, i_b, v_x, s_z)
+    res, d_n, d_b, d_x, d_z = solve_dual(cols, i_n, i_b, v_x, s_z)
     # if the dual solution is unbounded, d_x does not capture a primal solution
     if res == Result.UNBOUNDED:
         res = Result.INFEASIBLE
@@ -141,15 +291,17 @@ def solve(m_a, i_n, i_b, v_x, v_z):
         return res, d_n, d_b, d_x, d_z
 
     # adjust objective coefficients for solving the second phase
+    pos = {t: j for j, t in enumerate(i_n)}
+
     def val(t):
-        return -v_z[i_n.index(t)][0] if t in i_n else 0
+        j = pos.get(t)
+        return -v_z[j][0] if j is not None else 0
 
-    m_n = extract(rev, d_n, m_a)
-    m_b = extract(rev, d_b, m_a)
-    c_n = [val(t) for t in d_n]
-    c_b = [val(t) for t in d_b]
-    r_z = (m_b.inv() * m_n).trans() * vec(c_b) - vec(c_n)
-    return solve_primal(rev, m_a, d_n, d_b, d_x, r_z)
+    # the reduced costs N^T B^-T c_b - c_n need a single transposed solve
+    y = Basis([cols[t] for t in d_b]).solve_trans([val(t) for t in d_b])
+    r_z = vec([sum(a * b for a, b in zip(cols[t], y) if a != 0) - val(t) for t in d_n])
+    # the results of the first phase are not used elsewhere
+    return solve_primal(cols, d_n, d_b, d_x, r_z, copy=False)
 
 
 def print_solution(i_n, i_b, v_x, v_z, res, s_n, s_b, s_x, s_z):
@@ -159,9 +311,10 @@ def print_solution(i_n, i_b, v_x, v_z, res, s_n, s_b, s_x, s_z):
 
     def ps(v, i_n, v_z, i_b, v_x):
         res = 0
+        pos = {t: j for j, t in enumerate(i_b)}
         for i, t in enumerate(i_n):
-            if t in i_b:
-                j = i_b.index(t)
+            j = pos.get(t)
+            if j is not None:
                 print(f"{v}_{t} = {v_x[j][0]}")
                 res -= v_z[i][0] * v_x[j][0]
             else: